@@ -1,11 +1,85 @@
 
 from __future__ import annotations
-import sys
+import argparse, os, sys, time
 
+from config import MATRIX_WIDTH, MATRIX_HEIGHT, DEFAULT_GAMMA
 
- 
+def _positive_int(v):
+    try:
+        n = int(v)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'not an integer: {v!r}')
+    if n < 1:
+        raise argparse.ArgumentTypeError('must be at least 1')
+    return n
 
-def main():
+def _parse_args(argv):
+    p = argparse.ArgumentParser(description="RGB matrix web editor and headless converter")
+    p.add_argument('--no-ui', action='store_true', help='Do not start the web server; convert files instead')
+    p.add_argument('--image', help='Single image/GIF/.p8 to convert')
+    p.add_argument('--save', help='Output path for --image (.png, or .rgb for a raw frame bundle)')
+    p.add_argument('--input', help='Directory of images/GIFs/carts to batch-convert')
+    p.add_argument('--output', help='Output directory for --input')
+    p.add_argument('--format', choices=('png', 'raw'), default='png', help='Batch output format')
+    p.add_argument('--jobs', type=_positive_int, default=None, help='Worker processes (default: all cores)')
+    p.add_argument('--force', action='store_true', help='Reconvert even if inputs are unchanged')
+    p.add_argument('--width', type=int, default=MATRIX_WIDTH)
+    p.add_argument('--height', type=int, default=MATRIX_HEIGHT)
+    p.add_argument('--gamma', type=float, default=DEFAULT_GAMMA)
+    p.add_argument('--dither', action='store_true', help='Ordered dithering')
+    return p.parse_args(argv)
+
+def _convert_single(args):
+    from batch_convert import load_frames, write_outputs
+    frames, delays = load_frames(args.image, args.width, args.height, args.gamma, args.dither)
+    if args.save:
+        base, ext = os.path.splitext(args.save)
+        for path in write_outputs(frames, delays, base, 'raw' if ext.lower() == '.rgb' else 'png'):
+            print(path)
+    # Mirror to the panel when the hardware library is present. Only the
+    # panel module is imported: no web server, playlist or UDP listener.
+    from panel import matrix
+    if matrix is None:
+        if not args.save:
+            print('Nothing to do: no --save given and no panel available', file=sys.stderr)
+            return 1
+        return 0
+    print('Showing on panel; Ctrl-C to exit')
+    try:
+        if len(frames) == 1:
+            matrix.SetImage(frames[0], 0, 0, unsafe=False)
+            while True:
+                time.sleep(3600)
+        while True:
+            for frame, delay in zip(frames, delays):
+                matrix.SetImage(frame, 0, 0, unsafe=False)
+                time.sleep(max(0.001, delay / 1000.0))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.no_ui:
+        if args.input:
+            if not args.output:
+                print('--input needs --output', file=sys.stderr)
+                return 2
+            if not os.path.isdir(args.input):
+                print(f'--input directory not found: {args.input}', file=sys.stderr)
+                return 2
+            if os.path.realpath(args.input) == os.path.realpath(args.output):
+                print('--output must differ from --input', file=sys.stderr)
+                return 2
+            from batch_convert import convert_tree, format_summary
+            summary = convert_tree(args.input, args.output, args.width, args.height, gamma=args.gamma,
+                                   dither=args.dither, fmt=args.format, jobs=args.jobs, force=args.force)
+            print(format_summary(summary))
+            return 1 if summary['failed'] else 0
+        if args.image:
+            return _convert_single(args)
+        print('--no-ui needs --image or --input', file=sys.stderr)
+        return 2
     from flask_app import app
     # Serve on all interfaces so you can connect from another device on the LAN
     app.run(host='0.0.0.0', port=5000, debug=False)
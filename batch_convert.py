@@ -0,0 +1,201 @@
+from __future__ import annotations
+import hashlib, json, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+from PIL import Image
+
+from tools_image import to_panel_image
+from anim import gif_frames
+from pico8 import load_p8_gfx
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+GIF_EXTS = ('.gif',)
+CART_EXTS = ('.p8',)
+FORMATS = ('png', 'raw')
+MANIFEST_NAME = '.panel_manifest.json'
+OUTPUT_EXTS = ('.png', '.rgb', '.json')
+# Bump when the output layout changes so old builds are regenerated
+CONVERTER_VERSION = 1
+
+def _kind(path: str) -> Optional[str]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in GIF_EXTS: return 'gif'
+    if ext in IMAGE_EXTS: return 'image'
+    if ext in CART_EXTS: return 'cart'
+    return None
+
+def load_frames(path: str, w: int, h: int, gamma: float, dither: bool) -> Tuple[List[Image.Image], List[int]]:
+    """Decode an image, GIF or .p8 cart into panel-ready RGB frames and delays (ms)."""
+    kind = _kind(path)
+    with open(path, 'rb') as fp:
+        if kind == 'gif':
+            pairs = gif_frames(fp)
+        elif kind == 'cart':
+            pairs = [(load_p8_gfx(fp), 0)]
+        elif kind == 'image':
+            im = Image.open(fp)
+            im.load()
+            pairs = [(im, 0)]
+        else:
+            raise ValueError(f"unsupported file type: {path}")
+    frames = [to_panel_image(im, w, h, gamma=gamma, dither=dither) for im, _ in pairs]
+    delays = [d or 100 for _, d in pairs] if kind == 'gif' else [0]
+    return frames, delays
+
+def write_outputs(frames: List[Image.Image], delays: List[int], base: str, fmt: str) -> List[str]:
+    """Write frames next to `base` (path without extension) and return the files written.
+
+    png: a single PNG; animations become a horizontal strip (playable via /strip)
+         with a .json sidecar holding the per-frame delays.
+    raw: concatenated RGB888 frames in a .rgb file plus a .json sidecar.
+    """
+    w, h = frames[0].size
+    meta = {'width': w, 'height': h, 'frames': len(frames), 'delays': delays, 'format': fmt}
+    os.makedirs(os.path.dirname(base) or '.', exist_ok=True)
+    out = []
+    if fmt == 'png':
+        if len(frames) == 1:
+            sheet = frames[0]
+        else:
+            sheet = Image.new('RGB', (w * len(frames), h))
+            for i, f in enumerate(frames):
+                sheet.paste(f, (i * w, 0))
+        sheet.save(base + '.png', 'PNG')
+        out.append(base + '.png')
+        if len(frames) == 1:
+            return out
+    elif fmt == 'raw':
+        with open(base + '.rgb', 'wb') as f:
+            for fr in frames:
+                f.write(fr.tobytes())
+        out.append(base + '.rgb')
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    out.append(base + '.json')
+    return out
+
+def params_key(w: int, h: int, gamma: float, dither: bool, fmt: str) -> str:
+    return json.dumps([CONVERTER_VERSION, w, h, round(gamma, 4), bool(dither), fmt])
+
+def _convert_job(src: str, base: str, params: str, prev: Optional[dict]) -> dict:
+    # Runs in a worker process: hash, skip if unchanged, else convert
+    with open(src, 'rb') as f:
+        data = f.read()
+    key = hashlib.sha256(data).hexdigest() + ':' + params
+    if isinstance(prev, dict) and prev.get('key') == key and all(os.path.exists(p) for p in prev.get('outputs', [])):
+        return {'key': key, 'outputs': prev['outputs'], 'frames': prev.get('frames', 0), 'bytes': len(data), 'skipped': True}
+    _, w, h, gamma, dither, fmt = json.loads(params)
+    frames, delays = load_frames(src, w, h, gamma, dither)
+    outputs = write_outputs(frames, delays, base, fmt)
+    return {'key': key, 'outputs': outputs, 'frames': len(frames), 'bytes': len(data), 'skipped': False}
+
+def find_inputs(src_dir: str, exclude: Optional[str] = None) -> List[str]:
+    """List convertible files under src_dir, skipping the `exclude` tree (the output dir)."""
+    skip = os.path.realpath(exclude) if exclude else None
+    found = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) != skip)
+        for name in sorted(files):
+            if _kind(name):
+                found.append(os.path.join(root, name))
+    return found
+
+def output_stems(rels: List[str]) -> List[str]:
+    """Pick a unique output path (without extension) for each input.
+
+    Inputs keep their own stem when nobody else shares it; e.g. logo.png and
+    logo.gif become logo_png and logo_gif, numbered further if those names are
+    also taken by other inputs.
+    """
+    stems = [os.path.splitext(rel)[0] for rel in rels]
+    counts = {}
+    for stem in stems:
+        counts[stem] = counts.get(stem, 0) + 1
+    taken = {stem for stem in stems if counts[stem] == 1}
+    out = []
+    for rel, stem in zip(rels, stems):
+        if counts[stem] > 1:
+            stem = stem + '_' + os.path.splitext(rel)[1].lstrip('.').lower()
+            cand, n = stem, 2
+            while cand in taken:
+                cand = f"{stem}_{n}"
+                n += 1
+            stem = cand
+            taken.add(stem)
+        out.append(stem)
+    return out
+
+def convert_tree(src_dir: str, out_dir: str, w: int, h: int, gamma: float = 2.2, dither: bool = False,
+                 fmt: str = 'png', jobs: Optional[int] = None, force: bool = False) -> dict:
+    """Convert every image/GIF/cart under src_dir into out_dir using a process pool.
+
+    Inputs whose content hash and conversion parameters match the manifest in
+    out_dir are skipped. Returns a summary dict.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if not os.path.isdir(src_dir):
+        raise NotADirectoryError(f"input directory not found: {src_dir}")
+    if os.path.realpath(src_dir) == os.path.realpath(out_dir):
+        raise ValueError("output directory must differ from the input directory")
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if not force and os.path.exists(manifest_path):
+        # Only a cache: if it is unreadable, rebuild everything
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        if not isinstance(manifest, dict):
+            manifest = {}
+    params = params_key(w, h, gamma, dither, fmt)
+    inputs = find_inputs(src_dir, exclude=out_dir)
+    summary = {'files': len(inputs), 'converted': 0, 'skipped': 0, 'failed': 0,
+               'frames': 0, 'bytes_in': 0, 'errors': {}}
+    new_manifest = {}
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = {}
+        rels = [os.path.relpath(src, src_dir) for src in inputs]
+        sources = {os.path.realpath(src) for src in inputs}
+        for src, rel, stem in zip(inputs, rels, output_stems(rels)):
+            base = os.path.join(out_dir, stem)
+            if any(os.path.realpath(base + ext) in sources for ext in OUTPUT_EXTS):
+                summary['failed'] += 1
+                summary['errors'][rel] = "output would overwrite an input file"
+                continue
+            futures[pool.submit(_convert_job, src, base, params, manifest.get(rel))] = rel
+        for fut in as_completed(futures):
+            rel = futures[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                summary['failed'] += 1
+                summary['errors'][rel] = str(e)
+                continue
+            skipped = res.pop('skipped')
+            summary['skipped' if skipped else 'converted'] += 1
+            summary['bytes_in'] += res.pop('bytes')
+            if not skipped:
+                summary['frames'] += res['frames']
+            new_manifest[rel] = res
+    summary['elapsed'] = time.perf_counter() - t0
+    os.makedirs(out_dir, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(new_manifest, f, indent=1, sort_keys=True)
+    return summary
+
+def format_summary(s: dict) -> str:
+    el = max(s['elapsed'], 1e-9)
+    done = s['converted'] + s['skipped']
+    lines = [
+        f"{s['files']} files: {s['converted']} converted, {s['skipped']} unchanged, {s['failed']} failed",
+        f"{s['frames']} frames rendered, {s['bytes_in'] / 1e6:.1f} MB read in {s['elapsed']:.2f}s",
+        f"{done / el:.1f} files/s, {s['frames'] / el:.1f} frames/s",
+    ]
+    for rel, err in sorted(s['errors'].items()):
+        lines.append(f"  error: {rel}: {err}")
+    return '\n'.join(lines)
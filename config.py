@@ -26,3 +26,23 @@ PALETTE = [
     (255, 128,   0), # 8
     (128,   0, 255), # 9
 ]
+
+# Playlist
+PLAYLIST_PATH = "playlist.json"      # persisted playlist (items + settings)
+PLAYLIST_MEDIA_DIR = "playlist_media" # uploaded images/GIFs/strips referenced by items
+PLAYLIST_AUTOPLAY = False            # resume the saved playlist when the server starts
+DEFAULT_ITEM_DURATION = 10.0         # seconds for still images / text
+DEFAULT_TRANSITION = "crossfade"     # cut | crossfade | wipe | slide
+DEFAULT_TRANSITION_MS = 500
+
+# UDP pixel listener (DDP / E1.31) for LAN frame sources
+UDP_ENABLED = False
+UDP_BIND = "0.0.0.0"
+UDP_DDP_PORT = 4048          # 0 disables DDP
+UDP_E131_PORT = 5568         # 0 disables E1.31 (sACN)
+UDP_E131_UNIVERSE = 1        # universe carrying the first pixels of the panel
+UDP_E131_CHANNELS = 510      # channels used per universe (170 RGB pixels)
+UDP_E131_MULTICAST = False   # join the sACN multicast groups for our universes
+UDP_ALLOWLIST = []           # source IPs allowed to send; empty accepts any
+UDP_FRAME_TIMEOUT_MS = 100   # partial frames older than this are discarded
+UDP_DROP_PARTIAL = True      # drop frames with missing/out-of-order packets instead of showing them
@@ -3,45 +3,25 @@ import io, threading, time, os
 from typing import Optional
 from flask import Flask, request, send_file, jsonify, render_template_string, redirect, url_for, session
 from PIL import Image, ImageEnhance
+import numpy as np
 
-from config import MATRIX_WIDTH, MATRIX_HEIGHT, DEFAULT_GAMMA, PANEL_BRIGHTNESS, CHAIN_LENGTH, PARALLEL, GPIO_SLOWDOWN
+from config import MATRIX_WIDTH, MATRIX_HEIGHT, DEFAULT_GAMMA, PANEL_BRIGHTNESS
+from config import PLAYLIST_PATH, PLAYLIST_MEDIA_DIR, PLAYLIST_AUTOPLAY
+from config import (UDP_ENABLED, UDP_BIND, UDP_DDP_PORT, UDP_E131_PORT, UDP_E131_UNIVERSE, UDP_E131_CHANNELS,
+                    UDP_E131_MULTICAST, UDP_ALLOWLIST, UDP_FRAME_TIMEOUT_MS, UDP_DROP_PARTIAL)
 from tools_image import to_panel_image
 from pico8 import load_p8_gfx
 from anim import gif_frames, strip_frames
+from playlist import Playlist, PlaylistPlayer
+from udp_listener import UdpPixelListener
+from panel import HAVE_MATRIX, matrix, MATRIX_INIT_ERROR
 from functools import wraps
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "dev-secret-change-me")
 
-# Optional RGB matrix hardware initialization
-HAVE_MATRIX = False
-matrix = None
-MATRIX_INIT_ERROR = None
-try:
-    from rgbmatrix import RGBMatrix, RGBMatrixOptions
-    HAVE_MATRIX = True
-except Exception as e:
-    RGBMatrix = None
-    RGBMatrixOptions = None
-    HAVE_MATRIX = False
-    MATRIX_INIT_ERROR = f"import_error: {e}"
-
-if HAVE_MATRIX:
-    try:
-        opts = RGBMatrixOptions()
-        opts.rows = MATRIX_HEIGHT
-        opts.cols = MATRIX_WIDTH
-        opts.chain_length = CHAIN_LENGTH
-        opts.parallel = PARALLEL
-        opts.gpio_slowdown = GPIO_SLOWDOWN
-        opts.brightness = int(PANEL_BRIGHTNESS)
-        matrix = RGBMatrix(options=opts)
-    except Exception as e:
-        matrix = None
-        HAVE_MATRIX = False
-        MATRIX_INIT_ERROR = f"init_error: {e}"
-
 current_img = Image.new('RGB', (MATRIX_WIDTH, MATRIX_HEIGHT), (0,0,0))
+current_frame = current_img  # what the panel shows, before brightness is applied
 anim_thread = None
 stop_flag = threading.Event()
 
@@ -374,8 +354,9 @@ def logout():
     return redirect(url_for("login"))
 
 def _set_current(img: Image.Image):
-    global current_img
+    global current_img, current_frame
     im = img.convert('RGB')
+    current_frame = im
     try:
         factor = max(1, min(100, int(current_brightness))) / 100.0
     except Exception:
@@ -464,20 +445,38 @@ def status():
     return jsonify({
         "have_matrix": HAVE_MATRIX,
         "init_error": MATRIX_INIT_ERROR,
+        "udp": udp_listener.stats() if udp_listener is not None else None,
     })
 
-def _play_frames(frames, delays_ms):
-    stop_flag.clear()
-    while not stop_flag.is_set():
+def _show_array(arr):
+    _set_current(Image.fromarray(arr, 'RGB'))
+
+_here = os.path.dirname(os.path.abspath(__file__))
+playlist = Playlist(os.path.join(_here, PLAYLIST_PATH), os.path.join(_here, PLAYLIST_MEDIA_DIR))
+def _panel_array():
+    return np.asarray(current_frame)
+
+player = PlaylistPlayer(playlist, _show_array, (MATRIX_WIDTH, MATRIX_HEIGHT), lambda: current_gamma, _panel_array)
+try:
+    playlist.load()
+except (OSError, ValueError, TypeError) as e:
+    # A bad playlist.json must not keep the server from starting
+    player.last_error = f"playlist load failed: {e}"
+
+def _play_frames(stop_event, frames, delays_ms):
+    while not stop_event.is_set():
         for f, d in zip(frames, delays_ms):
-            if stop_flag.is_set(): break
+            if stop_event.is_set(): break
             _set_current(to_panel_image(f, MATRIX_WIDTH, MATRIX_HEIGHT, gamma=current_gamma, dither=False))
-            time.sleep(max(0.001, d/1000.0))
+            stop_event.wait(max(0.001, d/1000.0))
 
 def _start_anim_thread(target, *args):
-    global anim_thread
+    # Each animation gets its own stop event, so a previous thread that is
+    # still winding down can never see its flag cleared by the new one.
+    global anim_thread, stop_flag
     stop()
-    anim_thread = threading.Thread(target=target, args=args, daemon=True)
+    stop_flag = threading.Event()
+    anim_thread = threading.Thread(target=target, args=(stop_flag,) + args, daemon=True)
     anim_thread.start()
 
 def stop():
@@ -527,6 +526,115 @@ def p8_sheet():
     sheet.save(buf, 'PNG'); buf.seek(0)
     return send_file(buf, mimetype='image/png')
 
+@app.get("/playlist")
+@login_required
+def playlist_get():
+    data = playlist.to_dict()
+    data["player"] = player.status()
+    return jsonify(data)
+
+@app.put("/playlist")
+@login_required
+def playlist_put():
+    data = request.get_json(silent=True) or {}
+    try:
+        playlist.replace(data)
+    except (ValueError, TypeError) as e:
+        return (str(e), 400)
+    return jsonify(playlist.to_dict())
+
+@app.post("/playlist/items")
+@login_required
+def playlist_add():
+    # JSON body for text items / already-stored media, or multipart with a file
+    f = request.files.get('file')
+    if f:
+        data = request.form.to_dict()
+        blob = f.read()
+        try:
+            Image.open(io.BytesIO(blob)).verify()
+        except Exception:
+            return ('not an image', 400)
+        data['path'] = playlist.store_media(blob, f.filename)
+        if not data.get('type'):
+            data['type'] = 'gif' if data['path'].endswith('.gif') else 'image'
+    else:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return ('item must be an object', 400)
+    try:
+        index = data.pop('index', None)
+        idx = playlist.add(data, None if index in (None, '') else int(index))
+    except (ValueError, TypeError) as e:
+        return (str(e), 400)
+    return jsonify({"index": idx, "item": playlist.to_dict()["items"][idx]})
+
+@app.patch("/playlist/items/<int:idx>")
+@login_required
+def playlist_update(idx):
+    data = request.get_json(silent=True) or {}
+    try:
+        item = playlist.update(idx, data)
+    except IndexError:
+        return ('no such item', 404)
+    except (ValueError, TypeError) as e:
+        return (str(e), 400)
+    return jsonify(item)
+
+@app.delete("/playlist/items/<int:idx>")
+@login_required
+def playlist_delete(idx):
+    try:
+        playlist.remove(idx)
+    except IndexError:
+        return ('no such item', 404)
+    return ('ok', 200)
+
+@app.post("/playlist/items/<int:idx>/move")
+@login_required
+def playlist_move(idx):
+    data = request.get_json(silent=True) or {}
+    try:
+        playlist.move(idx, int(data.get('to', 0)))
+    except IndexError:
+        return ('no such item', 404)
+    except (ValueError, TypeError) as e:
+        return (str(e), 400)
+    return jsonify(playlist.to_dict())
+
+@app.post("/playlist/play")
+@login_required
+def playlist_play():
+    _start_anim_thread(player.run)
+    return ('playing', 200)
+
+@app.post("/playlist/next")
+@login_required
+def playlist_next():
+    player.skip()
+    return ('ok', 200)
+
+if PLAYLIST_AUTOPLAY and playlist.items:
+    _start_anim_thread(player.run)
+
+def _show_rgb_buffer(buf):
+    _set_current(Image.frombuffer('RGB', (MATRIX_WIDTH, MATRIX_HEIGHT), buf, 'raw', 'RGB', 0, 1))
+
+# Optional UDP pixel listener (DDP / E1.31) for LAN frame sources
+udp_listener = None
+if UDP_ENABLED:
+    udp_listener = UdpPixelListener(
+        _show_rgb_buffer, (MATRIX_WIDTH, MATRIX_HEIGHT), bind=UDP_BIND,
+        ddp_port=UDP_DDP_PORT, e131_port=UDP_E131_PORT,
+        e131_universe=UDP_E131_UNIVERSE, e131_channels=UDP_E131_CHANNELS,
+        e131_multicast=UDP_E131_MULTICAST, allowlist=UDP_ALLOWLIST,
+        frame_timeout_ms=UDP_FRAME_TIMEOUT_MS, drop_partial=UDP_DROP_PARTIAL)
+    try:
+        udp_listener.start()
+    except OSError as e:
+        print(f"UDP listener disabled: {e}")
+        udp_listener = None
+
 if __name__ == '__main__':
     # Run on all interfaces so your laptop can connect
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,29 @@
+# Optional RGB matrix hardware initialization, shared by the web server and the CLI
+from config import MATRIX_WIDTH, MATRIX_HEIGHT, PANEL_BRIGHTNESS, CHAIN_LENGTH, PARALLEL, GPIO_SLOWDOWN
+
+HAVE_MATRIX = False
+matrix = None
+MATRIX_INIT_ERROR = None
+try:
+    from rgbmatrix import RGBMatrix, RGBMatrixOptions
+    HAVE_MATRIX = True
+except Exception as e:
+    RGBMatrix = None
+    RGBMatrixOptions = None
+    HAVE_MATRIX = False
+    MATRIX_INIT_ERROR = f"import_error: {e}"
+
+if HAVE_MATRIX:
+    try:
+        opts = RGBMatrixOptions()
+        opts.rows = MATRIX_HEIGHT
+        opts.cols = MATRIX_WIDTH
+        opts.chain_length = CHAIN_LENGTH
+        opts.parallel = PARALLEL
+        opts.gpio_slowdown = GPIO_SLOWDOWN
+        opts.brightness = int(PANEL_BRIGHTNESS)
+        matrix = RGBMatrix(options=opts)
+    except Exception as e:
+        matrix = None
+        HAVE_MATRIX = False
+        MATRIX_INIT_ERROR = f"init_error: {e}"
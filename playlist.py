@@ -0,0 +1,429 @@
+from __future__ import annotations
+import copy, datetime, hashlib, json, os, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from config import (TARGET_FPS, DEFAULT_ITEM_DURATION, DEFAULT_TRANSITION,
+                    DEFAULT_TRANSITION_MS)
+from tools_image import to_panel_image, apply_gamma
+from anim import gif_frames, strip_frames
+
+ITEM_TYPES = ('image', 'gif', 'strip', 'text')
+TRANSITIONS = ('cut', 'crossfade', 'wipe', 'slide')
+
+# A rendered item: panel-sized uint8 RGB frames plus per-frame delays in ms
+# (None for a still frame, which is held for the item's duration).
+Rendered = Tuple[List[np.ndarray], List[Optional[int]]]
+
+def _parse_hhmm(v) -> Tuple[int, int]:
+    h, m = str(v).split(':')
+    h, m = int(h), int(m)
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError(f"bad time: {v}")
+    return h, m
+
+def normalize_item(data: dict) -> dict:
+    """Validate a playlist item and coerce form/JSON values to their types.
+
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("item must be an object")
+    kind = data.get('type')
+    if kind not in ITEM_TYPES:
+        raise ValueError(f"type must be one of {', '.join(ITEM_TYPES)}")
+    item = {'type': kind, 'enabled': str(data.get('enabled', True)).lower() not in ('0', 'false', 'no')}
+    if kind == 'text':
+        text = str(data.get('text', ''))
+        if not text:
+            raise ValueError("text item needs 'text'")
+        item['text'] = text
+        item['color'] = str(data.get('color', '#ffffff'))
+        ImageColor.getrgb(item['color'])
+    else:
+        path = str(data.get('path', ''))
+        if not path or os.path.basename(path) != path:
+            raise ValueError("item needs a media 'path' (file name inside the media dir)")
+        item['path'] = path
+    if kind == 'strip':
+        item['cols'] = max(1, int(data.get('cols', 8)))
+        item['rows'] = max(1, int(data.get('rows', 1)))
+    if kind in ('strip', 'text') and data.get('delay') not in (None, ''):
+        item['delay'] = max(1, int(data['delay']))
+    if data.get('duration') not in (None, ''):
+        item['duration'] = max(0.1, float(data['duration']))
+    item['loops'] = max(1, int(data.get('loops', 1)))
+    if data.get('transition') not in (None, ''):
+        if data['transition'] not in TRANSITIONS:
+            raise ValueError(f"transition must be one of {', '.join(TRANSITIONS)}")
+        item['transition'] = data['transition']
+    if data.get('transition_ms') not in (None, ''):
+        item['transition_ms'] = max(0, int(data['transition_ms']))
+    sched = data.get('schedule')
+    if isinstance(sched, str) and sched:
+        sched = json.loads(sched)
+    if sched:
+        if not isinstance(sched, dict):
+            raise ValueError("schedule must be an object")
+        out = {}
+        if sched.get('days') is not None:
+            out['days'] = sorted({int(d) % 7 for d in sched['days']})
+        for k in ('start', 'end'):
+            if sched.get(k):
+                h, m = _parse_hhmm(sched[k])
+                out[k] = f"{h:02d}:{m:02d}"
+        item['schedule'] = out
+    return item
+
+def is_scheduled(item: dict, now: Optional[datetime.datetime] = None) -> bool:
+    """True if the item is enabled and its schedule (days 0=Mon, HH:MM window) covers `now`."""
+    if not item.get('enabled', True):
+        return False
+    sched = item.get('schedule')
+    if not sched:
+        return True
+    now = now or datetime.datetime.now()
+    days = sched.get('days')
+    if days is not None and now.weekday() not in days:
+        return False
+    cur = now.hour * 60 + now.minute
+    start = sched.get('start')
+    end = sched.get('end')
+    s = _parse_hhmm(start) if start else (0, 0)
+    e = _parse_hhmm(end) if end else (24, 0)
+    s = s[0] * 60 + s[1]
+    e = e[0] * 60 + e[1]
+    if s <= e:
+        return s <= cur < e
+    return cur >= s or cur < e  # window wraps past midnight
+
+def _text_frames(item: dict, w: int, h: int, gamma: float) -> Rendered:
+    font = ImageFont.load_default()
+    text = item['text']
+    color = ImageColor.getrgb(item.get('color', '#ffffff'))[:3]
+    probe = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+    l, t, r, b = probe.textbbox((0, 0), text, font=font)
+    tw, th = r - l, b - t
+    y = (h - th) // 2 - t
+    if tw <= w:
+        img = Image.new('RGB', (w, h), (0, 0, 0))
+        ImageDraw.Draw(img).text(((w - tw) // 2 - l, y), text, font=font, fill=color)
+        return [np.asarray(apply_gamma(img, gamma))], [None]
+    # Too wide: scroll right-to-left, entering and leaving fully off-panel
+    strip = Image.new('RGB', (tw + 2 * w, h), (0, 0, 0))
+    ImageDraw.Draw(strip).text((w - l, y), text, font=font, fill=color)
+    strip = apply_gamma(strip, gamma)
+    frames = [np.asarray(strip.crop((x, 0, x + w, h))) for x in range(0, tw + w + 1)]
+    delay = item.get('delay', max(1, 1000 // TARGET_FPS))
+    return frames, [delay] * len(frames)
+
+def render_item(item: dict, media_dir: str, w: int, h: int, gamma: float) -> Rendered:
+    """Decode an item and convert every frame to a panel-ready array."""
+    kind = item['type']
+    if kind == 'text':
+        return _text_frames(item, w, h, gamma)
+    path = os.path.join(media_dir, item['path'])
+    panel = lambda im: np.asarray(to_panel_image(im, w, h, gamma=gamma, dither=False))
+    if kind == 'image':
+        with Image.open(path) as im:
+            return [panel(im)], [None]
+    if kind == 'gif':
+        with open(path, 'rb') as fp:
+            pairs = gif_frames(fp)
+        return [panel(f) for f, _ in pairs], [d or 100 for _, d in pairs]
+    with Image.open(path) as im:
+        frames = strip_frames(im.convert('RGBA'), item['cols'], item['rows'])
+    delay = item.get('delay', 80)
+    return [panel(f) for f in frames], [delay] * len(frames)
+
+def blend(kind: str, a: np.ndarray, b: np.ndarray, t: float, out: np.ndarray, scratch: np.ndarray) -> np.ndarray:
+    """Write transition frame `t` (0..1) from `a` to `b` into `out`.
+
+    `a`, `b` and `scratch` are float32 HxWx3 buffers, `out` is uint8 HxWx3;
+    all are preallocated by the caller so no per-frame arrays are created.
+    """
+    w = out.shape[1]
+    if kind == 'crossfade':
+        np.subtract(b, a, out=scratch)
+        scratch *= t
+        scratch += a
+        scratch += 0.5
+        np.copyto(out, scratch, casting='unsafe')
+    elif kind == 'wipe':
+        x = int(round(t * w))
+        np.copyto(out[:, :x], b[:, :x], casting='unsafe')
+        np.copyto(out[:, x:], a[:, x:], casting='unsafe')
+    elif kind == 'slide':
+        x = int(round(t * w))
+        np.copyto(out[:, :w - x], a[:, x:], casting='unsafe')
+        np.copyto(out[:, w - x:], b[:, :x], casting='unsafe')
+    else:
+        np.copyto(out, b, casting='unsafe')
+    return out
+
+class Playlist:
+    """Ordered, persisted list of items. All access goes through the lock so
+    the REST handlers can edit it while the player is running."""
+
+    def __init__(self, path: str, media_dir: str):
+        self.path = path
+        self.media_dir = media_dir
+        self.items: List[dict] = []
+        self.transition = DEFAULT_TRANSITION
+        self.transition_ms = DEFAULT_TRANSITION_MS
+        self._lock = threading.RLock()
+
+    def _parse(self, data) -> Tuple[List[dict], str, int]:
+        if not isinstance(data, dict):
+            raise ValueError("playlist must be an object")
+        items = data.get('items', [])
+        if not isinstance(items, list):
+            raise ValueError("items must be a list")
+        items = [normalize_item(it) for it in items]
+        transition = data.get('transition', self.transition)
+        if transition not in TRANSITIONS:
+            raise ValueError(f"transition must be one of {', '.join(TRANSITIONS)}")
+        transition_ms = max(0, int(data.get('transition_ms', self.transition_ms)))
+        return items, transition, transition_ms
+
+    def load(self):
+        """Load the saved playlist; on any error the current (empty) playlist is kept."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        items, transition, transition_ms = self._parse(data)
+        with self._lock:
+            self.items = items
+            self.transition = transition
+            self.transition_ms = transition_ms
+
+    def save(self):
+        # Held for the whole write: Flask serves requests on several threads
+        # and they all share the one temp file.
+        with self._lock:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            os.replace(tmp, self.path)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'items': copy.deepcopy(self.items),
+                'transition': self.transition,
+                'transition_ms': self.transition_ms,
+            }
+
+    def replace(self, data: dict):
+        items, transition, transition_ms = self._parse(data)
+        with self._lock:
+            self.items = items
+            self.transition = transition
+            self.transition_ms = transition_ms
+        self.save()
+
+    def add(self, data: dict, index: Optional[int] = None) -> int:
+        item = normalize_item(data)
+        with self._lock:
+            if index is None or index >= len(self.items):
+                self.items.append(item)
+                index = len(self.items) - 1
+            else:
+                index = max(0, index)
+                self.items.insert(index, item)
+        self.save()
+        return index
+
+    def update(self, index: int, changes: dict) -> dict:
+        with self._lock:
+            merged = dict(self.items[index])
+            merged.update(changes)
+            item = normalize_item(merged)
+            self.items[index] = item
+        self.save()
+        return copy.deepcopy(item)
+
+    def remove(self, index: int):
+        with self._lock:
+            del self.items[index]
+        self.save()
+
+    def move(self, src: int, dst: int):
+        with self._lock:
+            item = self.items.pop(src)
+            self.items.insert(max(0, min(dst, len(self.items))), item)
+        self.save()
+
+    def store_media(self, data: bytes, filename: str) -> str:
+        """Save uploaded media under a content-hash name and return that name."""
+        ext = os.path.splitext(filename or '')[1].lower() or '.png'
+        name = hashlib.sha1(data).hexdigest()[:16] + ext
+        os.makedirs(self.media_dir, exist_ok=True)
+        dest = os.path.join(self.media_dir, name)
+        if not os.path.exists(dest):
+            with open(dest, 'wb') as f:
+                f.write(data)
+        return name
+
+    def next_after(self, index: int, now: Optional[datetime.datetime] = None) -> Optional[Tuple[int, dict]]:
+        """Return (index, item copy) of the next playable item after `index`, wrapping around."""
+        with self._lock:
+            n = len(self.items)
+            for step in range(1, n + 1):
+                i = (index + step) % n
+                if is_scheduled(self.items[i], now):
+                    return i, copy.deepcopy(self.items[i])
+        return None
+
+    def transition_for(self, item: dict) -> Tuple[str, int]:
+        with self._lock:
+            return (item.get('transition', self.transition),
+                    item.get('transition_ms', self.transition_ms))
+
+class PlaylistPlayer:
+    """Plays a Playlist, decoding the next item on a worker thread while the
+    current one is on screen and blending between them with numpy."""
+
+    def __init__(self, playlist: Playlist, show: Callable[[np.ndarray], None],
+                 size: Tuple[int, int], gamma: Callable[[], float],
+                 panel: Callable[[], np.ndarray], fps: int = TARGET_FPS):
+        self.playlist = playlist
+        self._show = show
+        self._panel = panel  # returns what the panel is showing now, whatever its source
+        self._gamma = gamma
+        self._fps = max(1, fps)
+        w, h = size
+        self.size = (w, h)
+        # Preallocated transition buffers (source, target, scratch, output)
+        self._a = np.zeros((h, w, 3), np.float32)
+        self._b = np.zeros((h, w, 3), np.float32)
+        self._scratch = np.zeros((h, w, 3), np.float32)
+        self._out = np.zeros((h, w, 3), np.uint8)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='playlist-preload')
+        self._skip = threading.Event()
+        self._run_lock = threading.Lock()
+        self.running = False
+        self.index = -1
+        self.last_error: Optional[str] = None
+
+    def status(self) -> dict:
+        return {'running': self.running, 'index': self.index, 'last_error': self.last_error}
+
+    def skip(self):
+        self._skip.set()
+
+    def _submit(self, item: dict, gamma: float) -> Future:
+        w, h = self.size
+        return self._executor.submit(render_item, item, self.playlist.media_dir, w, h, gamma)
+
+    def _sleep(self, seconds: float, stop_flag: threading.Event) -> bool:
+        """Sleep in short slices; returns False if stopped or skipped."""
+        end = time.monotonic() + seconds
+        while True:
+            if stop_flag.is_set() or self._skip.is_set():
+                return False
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return True
+            stop_flag.wait(min(remaining, 0.05))
+
+    def _result(self, fut: Future, stop_flag: threading.Event):
+        """Wait for a decode, giving up (None) as soon as the player is stopped."""
+        while True:
+            try:
+                return fut.result(timeout=0.05)
+            except FutureTimeout:
+                if stop_flag.is_set():
+                    return None
+
+    def _transition(self, target: np.ndarray, item: dict, stop_flag: threading.Event):
+        kind, ms = self.playlist.transition_for(item)
+        if kind == 'cut' or ms <= 0:
+            return
+        # Blend from the panel's real contents: a /frame push or another
+        # animation may have replaced our last frame since it was shown.
+        source = self._panel()
+        if source.shape != target.shape:
+            return
+        np.copyto(self._a, source, casting='unsafe')
+        np.copyto(self._b, target, casting='unsafe')
+        steps = max(1, int(ms * self._fps / 1000))
+        dt = ms / 1000.0 / steps
+        for i in range(1, steps):
+            blend(kind, self._a, self._b, i / steps, self._out, self._scratch)
+            self._show(self._out)
+            if not self._sleep(dt, stop_flag):
+                return
+
+    def _play_item(self, frames, delays, item, stop_flag):
+        duration = item.get('duration')
+        if duration is None and all(d is None for d in delays):
+            duration = DEFAULT_ITEM_DURATION
+        deadline = time.monotonic() + duration if duration else None
+        passes = 0
+        while True:
+            for frame, delay in zip(frames, delays):
+                self._show(frame)
+                # Still frames (delay None) always come with a deadline
+                wait = delay / 1000.0 if delay else deadline - time.monotonic()
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                if not self._sleep(max(0.0, wait), stop_flag):
+                    return
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+            passes += 1
+            if deadline is None and passes >= item.get('loops', 1):
+                return
+
+    def run(self, stop_flag: threading.Event):
+        """Play until `stop_flag` is set. A second run waits for the first to exit,
+        so the shared buffers and state are only ever used by one thread."""
+        with self._run_lock:
+            self.running = True
+            try:
+                self._run(stop_flag)
+            finally:
+                self.running = False
+
+    def _run(self, stop_flag: threading.Event):
+        pending = None  # (index, item, gamma, future) decoded ahead of time
+        while not stop_flag.is_set():
+            self._skip.clear()
+            pick = self.playlist.next_after(self.index)
+            if pick is None:
+                pending = None
+                self._sleep(1.0, stop_flag)
+                continue
+            idx, item = pick
+            gamma = self._gamma()
+            if pending is not None and pending[:3] == (idx, item, gamma):
+                fut = pending[3]
+            else:
+                fut = self._submit(item, gamma)
+            pending = None
+            try:
+                rendered = self._result(fut, stop_flag)
+            except Exception as e:
+                self.last_error = f"{item.get('path') or item['type']}: {e}"
+                self.index = idx
+                self._sleep(0.5, stop_flag)
+                continue
+            if rendered is None:
+                return
+            frames, delays = rendered
+            self.index = idx
+            self._transition(frames[0], item, stop_flag)
+            # Decode the following item while this one is on screen
+            nxt = self.playlist.next_after(idx)
+            if nxt is not None:
+                if nxt[1] == item:
+                    fut = Future()
+                    fut.set_result((frames, delays))
+                else:
+                    fut = self._submit(nxt[1], gamma)
+                pending = (nxt[0], nxt[1], gamma, fut)
+            self._play_item(frames, delays, item, stop_flag)
@@ -0,0 +1,262 @@
+from __future__ import annotations
+import select, socket, struct, threading, time
+from typing import Callable, Iterable, Optional, Tuple
+
+DDP_HEADER = 10
+DDP_HEADER_TC = 14          # with timecode
+DDP_VER_MASK = 0xC0
+DDP_VER1 = 0x40
+DDP_TIMECODE = 0x10
+DDP_QUERY = 0x02
+DDP_PUSH = 0x01
+
+E131_HEADER = 126
+E131_ACN_ID = b'ASC-E1.17\x00\x00\x00'
+E131_ROOT_VECTOR = 0x00000004
+E131_DATA_VECTOR = 0x00000002
+E131_TERMINATED = 0x40
+
+_U32 = struct.Struct('>I')
+_U16 = struct.Struct('>H')
+_DDP_OFFSET_LEN = struct.Struct('>IH')
+
+def e131_multicast_group(universe: int) -> str:
+    return f"239.255.{(universe >> 8) & 0xFF}.{universe & 0xFF}"
+
+class _Frame:
+    """Preallocated frame being assembled from packets."""
+
+    def __init__(self, size: int, parts: int = 0):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.size = size
+        self.seen = bytearray(parts)        # E1.31: universes received this frame
+        self._unseen = bytes(parts)
+        self.reset()
+
+    def reset(self):
+        self.started = 0.0
+        self.filled = 0                     # bytes (DDP) or universes (E1.31)
+        self.damaged = False
+        if self.seen:
+            self.seen[:] = self._unseen
+
+class UdpPixelListener:
+    """Receive DDP and/or E1.31 pixel data on a background thread.
+
+    Packets are received into one reusable buffer and copied by offset into a
+    preallocated RGB888 frame; completed frames are passed to `show` (which
+    must copy the data before returning).
+    """
+
+    def __init__(self, show: Callable[[bytearray], None], size: Tuple[int, int],
+                 bind: str = '0.0.0.0', ddp_port: int = 4048, e131_port: int = 5568,
+                 e131_universe: int = 1, e131_channels: int = 510, e131_multicast: bool = False,
+                 allowlist: Iterable[str] = (), frame_timeout_ms: int = 100, drop_partial: bool = True):
+        w, h = size
+        self._show = show
+        self.frame_size = w * h * 3
+        self.bind = bind
+        self.ddp_port = ddp_port
+        self.e131_port = e131_port
+        self.e131_universe = e131_universe
+        self.e131_channels = max(3, min(512, e131_channels))
+        self.e131_universes = -(-self.frame_size // self.e131_channels)
+        self.e131_multicast = e131_multicast
+        self.allowlist = frozenset(allowlist)
+        self.frame_timeout = max(1, frame_timeout_ms) / 1000.0
+        self.drop_partial = drop_partial
+        self._pkt = bytearray(65536)
+        self._pkt_view = memoryview(self._pkt)
+        self._ddp = _Frame(self.frame_size)
+        self._ddp_seq = 0
+        self._ddp_offset = -1
+        self._e131 = _Frame(self.frame_size, self.e131_universes)
+        self._e131_seq = [-1] * self.e131_universes
+        self._socks = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.counters = {
+            'packets': 0, 'bytes': 0, 'frames': 0,
+            'dropped_frames': 0, 'timeouts': 0,
+            'rejected': 0, 'malformed': 0, 'out_of_order': 0, 'ignored': 0,
+        }
+
+    def stats(self) -> dict:
+        out = dict(self.counters)
+        out['running'] = self._thread is not None and self._thread.is_alive()
+        out['ports'] = {name: s.getsockname()[1] for name, s in self._socks.items()}
+        return out
+
+    def _open(self, port: int, reuse: bool = False) -> socket.socket:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # Only multicast receivers may share a port; otherwise a second
+            # process binding it must fail with EADDRINUSE rather than
+            # silently take over our unicast traffic.
+            if reuse:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            except OSError:
+                pass
+            s.bind((self.bind, port))
+            s.setblocking(False)
+        except OSError:
+            s.close()
+            raise
+        return s
+
+    def start(self):
+        try:
+            if self.ddp_port:
+                self._socks['ddp'] = self._open(self.ddp_port)
+            if self.e131_port:
+                s = self._open(self.e131_port, reuse=self.e131_multicast)
+                self._socks['e131'] = s
+                if self.e131_multicast:
+                    for i in range(self.e131_universes):
+                        group = e131_multicast_group(self.e131_universe + i)
+                        mreq = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton('0.0.0.0'))
+                        s.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError:
+            for s in self._socks.values():
+                s.close()
+            self._socks = {}
+            raise
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='udp-pixels', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        for s in self._socks.values():
+            s.close()
+        self._socks = {}
+
+    def _finish(self, frame: _Frame, complete: bool):
+        if complete and not frame.damaged:
+            self.counters['frames'] += 1
+            self._show(frame.buf)
+        elif self.drop_partial:
+            self.counters['dropped_frames'] += 1
+        else:
+            # Show what arrived on top of the previous frame's pixels
+            self.counters['frames'] += 1
+            self._show(frame.buf)
+        frame.reset()
+
+    def _expire(self, now: float):
+        for frame in (self._ddp, self._e131):
+            if frame.started and now - frame.started > self.frame_timeout:
+                self.counters['timeouts'] += 1
+                self._finish(frame, False)
+
+    def _run(self):
+        handlers = {s: (self._on_ddp if name == 'ddp' else self._on_e131) for name, s in self._socks.items()}
+        socks = list(handlers)
+        tick = min(self.frame_timeout, 0.25)
+        pkt = self._pkt
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select(socks, [], [], tick)
+            except (OSError, ValueError):
+                break
+            for s in ready:
+                handler = handlers[s]
+                while True:
+                    try:
+                        n, addr = s.recvfrom_into(pkt)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        break
+                    self.counters['packets'] += 1
+                    self.counters['bytes'] += n
+                    if self.allowlist and addr[0] not in self.allowlist:
+                        self.counters['rejected'] += 1
+                        continue
+                    handler(n)
+            self._expire(time.monotonic())
+
+    def _on_ddp(self, n: int):
+        pkt = self._pkt
+        if n < DDP_HEADER or (pkt[0] & DDP_VER_MASK) != DDP_VER1:
+            self.counters['malformed'] += 1
+            return
+        flags = pkt[0]
+        if flags & DDP_QUERY:
+            self.counters['ignored'] += 1
+            return
+        hdr = DDP_HEADER_TC if flags & DDP_TIMECODE else DDP_HEADER
+        offset, length = _DDP_OFFSET_LEN.unpack_from(pkt, 4)
+        if hdr + length > n:
+            self.counters['malformed'] += 1
+            return
+        frame = self._ddp
+        # Sequence numbers cycle 1..15; 0 means the sender doesn't use them.
+        # Some senders (e.g. LedFx) reuse one number for every packet of a
+        # frame, so only an identical (seq, offset) pair counts as a duplicate.
+        seq = pkt[1] & 0x0F
+        if seq and self._ddp_seq:
+            if seq == self._ddp_seq and offset == self._ddp_offset:
+                self.counters['out_of_order'] += 1
+                return
+            if seq != self._ddp_seq and seq != self._ddp_seq % 15 + 1:
+                self.counters['out_of_order'] += 1
+                frame.damaged = True
+        self._ddp_seq = seq
+        self._ddp_offset = offset
+        if offset < frame.size and length:
+            end = min(offset + length, frame.size)
+            frame.view[offset:end] = self._pkt_view[hdr:hdr + end - offset]
+            if not frame.started:
+                frame.started = time.monotonic()
+            frame.filled += end - offset
+        if flags & DDP_PUSH:
+            self._finish(frame, frame.filled >= frame.size)
+
+    def _on_e131(self, n: int):
+        pkt = self._pkt
+        if (n < E131_HEADER or self._pkt_view[4:16] != E131_ACN_ID
+                or _U32.unpack_from(pkt, 18)[0] != E131_ROOT_VECTOR
+                or _U32.unpack_from(pkt, 40)[0] != E131_DATA_VECTOR
+                or pkt[125] != 0):
+            # Sync/discovery packets and non-zero start codes land here too
+            self.counters['malformed'] += 1
+            return
+        index = _U16.unpack_from(pkt, 113)[0] - self.e131_universe
+        if not 0 <= index < self.e131_universes:
+            self.counters['ignored'] += 1
+            return
+        if pkt[112] & E131_TERMINATED:
+            self._e131_seq[index] = -1
+            self.counters['ignored'] += 1
+            return
+        # Per E1.31 6.7.2: discard if new - last is in (-20, 0]
+        seq = pkt[111]
+        last = self._e131_seq[index]
+        if last >= 0 and (seq == last or ((seq - last) & 0xFF) > 236):
+            self.counters['out_of_order'] += 1
+            return
+        self._e131_seq[index] = seq
+        count = min(_U16.unpack_from(pkt, 123)[0] - 1, n - E131_HEADER, self.e131_channels)
+        if count < 0:
+            self.counters['malformed'] += 1
+            return
+        frame = self._e131
+        if frame.seen[index]:
+            # Universe repeats before the frame completed: previous frame lost packets
+            self._finish(frame, False)
+        offset = index * self.e131_channels
+        end = min(offset + count, frame.size)
+        if end > offset:
+            frame.view[offset:end] = self._pkt_view[E131_HEADER:E131_HEADER + end - offset]
+        if not frame.started:
+            frame.started = time.monotonic()
+        frame.seen[index] = 1
+        frame.filled += 1
+        if frame.filled == self.e131_universes:
+            self._finish(frame, True)
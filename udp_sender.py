@@ -0,0 +1,98 @@
+# Loopback/LAN test sender for the UDP pixel listener (DDP or E1.31).
+# Usage:
+#   python udp_sender.py --protocol ddp --seconds 5
+#   python udp_sender.py --host 192.168.1.50 --protocol e131 --fps 30
+#   python udp_sender.py --image frame.png --fps 0    # as fast as possible
+from __future__ import annotations
+import argparse, struct, socket, time, uuid
+import numpy as np
+from PIL import Image
+
+from config import MATRIX_WIDTH, MATRIX_HEIGHT, UDP_DDP_PORT, UDP_E131_PORT, UDP_E131_UNIVERSE, UDP_E131_CHANNELS
+from udp_listener import E131_ACN_ID, E131_HEADER, E131_ROOT_VECTOR, E131_DATA_VECTOR
+
+DDP_CHUNK = 1440  # bytes of pixel data per packet (480 RGB pixels)
+
+def ddp_packets(frame: bytes, seq: int):
+    """Yield DDP packets for one frame; returns the next sequence number via StopIteration value."""
+    for off in range(0, len(frame), DDP_CHUNK):
+        chunk = frame[off:off + DDP_CHUNK]
+        last = off + DDP_CHUNK >= len(frame)
+        flags = 0x40 | (0x01 if last else 0)
+        yield struct.pack('>BBBBIH', flags, seq, 0x0B, 1, off, len(chunk)) + chunk
+        seq = seq % 15 + 1
+    return seq
+
+def e131_header(cid: bytes, universe: int, seq: int, count: int) -> bytes:
+    total = E131_HEADER + count
+    return (struct.pack('>HH', 0x0010, 0x0000) + E131_ACN_ID
+            + struct.pack('>HI', 0x7000 | (total - 16), E131_ROOT_VECTOR) + cid
+            + struct.pack('>HI', 0x7000 | (total - 38), E131_DATA_VECTOR)
+            + b'udp_sender'.ljust(64, b'\x00')
+            + struct.pack('>BHBBH', 100, 0, seq, 0, universe)
+            + struct.pack('>HBBHHH', 0x7000 | (total - 115), 0x02, 0xA1, 0, 1, count + 1)
+            + b'\x00')
+
+def test_pattern(w, h, t):
+    x = np.arange(w, dtype=np.float32)[None, :]
+    y = np.arange(h, dtype=np.float32)[:, None]
+    r = (np.sin(x / 6 + t) * 127 + 128).repeat(h, 0)
+    g = (np.sin(y / 5 + t * 1.3) * 127 + 128).repeat(w, 1)
+    b = (np.sin((x + y) / 8 - t) * 127 + 128)
+    return np.dstack([r, g, b]).astype(np.uint8).tobytes()
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--protocol', choices=('ddp', 'e131'), default='ddp')
+    p.add_argument('--port', type=int, default=0, help='Defaults to the configured port for the protocol')
+    p.add_argument('--image', help='Send this PNG (letterboxed) instead of a moving test pattern')
+    p.add_argument('--fps', type=float, default=30, help='0 = as fast as possible')
+    p.add_argument('--seconds', type=float, default=5)
+    p.add_argument('--width', type=int, default=MATRIX_WIDTH)
+    p.add_argument('--height', type=int, default=MATRIX_HEIGHT)
+    args = p.parse_args()
+
+    port = args.port or (UDP_DDP_PORT if args.protocol == 'ddp' else UDP_E131_PORT)
+    w, h = args.width, args.height
+    still = None
+    if args.image:
+        from tools_image import fit_letterbox
+        still = fit_letterbox(Image.open(args.image).convert('RGB'), (w, h)).tobytes()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    dest = (args.host, port)
+    cid = uuid.uuid4().bytes
+    universes = -(-w * h * 3 // UDP_E131_CHANNELS)
+    seq = 1
+    frames = packets = sent = 0
+    delay = 1.0 / args.fps if args.fps > 0 else 0.0
+    t0 = time.perf_counter()
+    next_at = t0
+    while time.perf_counter() - t0 < args.seconds:
+        frame = still or test_pattern(w, h, frames / 10.0)
+        if args.protocol == 'ddp':
+            gen = ddp_packets(frame, seq)
+            while True:
+                try:
+                    pkt = next(gen)
+                except StopIteration as stop:
+                    seq = stop.value
+                    break
+                sock.sendto(pkt, dest); packets += 1; sent += len(pkt)
+        else:
+            for i in range(universes):
+                chunk = frame[i * UDP_E131_CHANNELS:(i + 1) * UDP_E131_CHANNELS]
+                pkt = e131_header(cid, UDP_E131_UNIVERSE + i, seq, len(chunk)) + chunk
+                sock.sendto(pkt, dest); packets += 1; sent += len(pkt)
+            seq = (seq + 1) & 0xFF
+        frames += 1
+        if delay:
+            next_at += delay
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+    el = time.perf_counter() - t0
+    print(f"{frames} frames, {packets} packets, {sent / 1e6:.1f} MB in {el:.2f}s")
+    print(f"{frames / el:.1f} frames/s, {packets / el:.0f} packets/s, {sent * 8 / el / 1e6:.1f} Mbit/s")
+
+if __name__=='__main__':
+    main()